@@ -5,13 +5,11 @@
 # You can obtain one at http://mozilla.org/MPL/2.0/.
 
 import logging
-import platform
 from datetime import timedelta
 
 from fuzzfetch import BuildFlags, Fetcher, FetcherException
 
-from .evaluator.browser import BrowserBisector
-from .build_manager import BuildManager
+from .build_manager import BuildManager, build_prefix
 from .builds import BuildRange
 from .config import BisectionConfig
 
@@ -33,7 +31,7 @@ class Bisector(object):
         self.find_fix = args.find_fix
 
         self.build_flags = BuildFlags(asan=args.asan, debug=args.debug, fuzzing=args.fuzzing, coverage=args.coverage)
-        self.build_string = "m-%s-%s%s" % (self.branch[0], platform.system().lower(), self.build_flags.build_string())
+        self.build_string = build_prefix(self.branch, self.build_flags)
         self.start = Fetcher(self.target, self.branch, args.start, self.build_flags)
         self.end = Fetcher(self.target, self.branch, args.end, self.build_flags)
 
@@ -41,7 +39,8 @@ class Bisector(object):
         self.build_manager = BuildManager(self.config, self.build_string)
 
         if self.target == 'firefox':
-            self.evaluator = BrowserBisector(args)
+            from .evaluator.browser import BrowserBisector
+            self.evaluator = BrowserBisector(args, self.build_manager.resources, self.config.launch_memory)
         else:
             self.evaluator = None
 
@@ -61,35 +60,40 @@ class Bisector(object):
         log.info('Attempting to reduce bisection range using taskcluster binaries')
         build_range = BuildRange.new(
             self.start.build_datetime + timedelta(days=1),
-            self.end.build_datetime - timedelta(days=1))
+            self.end.build_datetime - timedelta(days=1),
+            lambda date: Fetcher(self.target, self.branch, date, self.build_flags))
 
         while build_range:
-            next_date = build_range.mid_point
-            i = build_range.index(next_date)
+            i = build_range.mid_index
 
             try:
-                next_build = Fetcher(self.target, self.branch, next_date, self.build_flags)
+                next_build = build_range[i]
             except FetcherException:
-                log.warning('Unable to find build for %s', next_date)
-                build_range.builds.pop(i)
+                log.warning('Unable to find build for %s', build_range.build_id(i))
+                build_range.remove(i)
             else:
+                if self.skip_known_failure(next_build):
+                    build_range.remove(i)
+                    continue
                 status = self.test_build(next_build)
                 build_range = self.update_build_range(next_build, i, status, build_range)
 
         # Further reduce using all available builds associated with the start and end boundaries
-        builds = []
-        for dt in [self.start.build_datetime, self.end.build_datetime]:
-            for build in Fetcher.iterall(self.target, self.branch, dt.strftime('%Y-%m-%d'), self.build_flags):
-                # Only keep builds after the start and before the end boundaries
-                if self.end.build_datetime > build.build_datetime > self.start.build_datetime:
-                    builds.append(build)
-
-        build_range = BuildRange(sorted(builds, key=lambda x: x.build_datetime))
+        # Only the timestamps and changesets are kept, builds are fetched again when tested
+        build_range = BuildRange.from_builds(
+            self.boundary_builds(),
+            lambda changeset: Fetcher(self.target, self.branch, changeset, self.build_flags))
         while build_range:
-            next_build = build_range.mid_point
-            i = build_range.index(next_build)
-            status = self.test_build(next_build)
-            build_range = self.update_build_range(next_build, i, status, build_range)
+            i = build_range.mid_index
+
+            try:
+                next_build = build_range[i]
+            except FetcherException:
+                log.warning('Unable to find build for %s', build_range.build_id(i))
+                build_range.remove(i)
+            else:
+                status = self.test_build(next_build)
+                build_range = self.update_build_range(next_build, i, status, build_range)
 
         log.info('Reduced build range to:')
         log.info('> Start: %s (%s)', self.start.changeset, self.start.build_id)
@@ -97,6 +101,18 @@ class Bisector(object):
         log.info('> Pushlog: https://hg.mozilla.org/integration/autoland/pushloghtml?fromchange=%s&tochange=%s',
                  self.start.changeset, self.end.changeset)
 
+    def boundary_builds(self):
+        """
+        Iterate over all builds from the days of the start and end boundaries which lie between them
+        Builds which are known to fail are skipped
+        """
+        for dt in [self.start.build_datetime, self.end.build_datetime]:
+            for build in Fetcher.iterall(self.target, self.branch, dt.strftime('%Y-%m-%d'), self.build_flags):
+                # Only keep builds after the start and before the end boundaries
+                if self.end.build_datetime > build.build_datetime > self.start.build_datetime:
+                    if not self.skip_known_failure(build):
+                        yield build
+
     def update_build_range(self, build, index, status, build_range):
         """
         Returns a new build range based on the status of the previously evaluated test
@@ -121,9 +137,22 @@ class Bisector(object):
                 self.start = build
                 return build_range[index + 1:]
         elif status == BUILD_FAILED:
-            build_range.builds.pop(index)
+            build_range.remove(index)
             return build_range
 
+    def skip_known_failure(self, build):
+        """
+        Check whether the supplied build previously failed to launch
+        :param build: A fuzzfetch.Fetcher object
+        :return: Boolean
+        """
+        reason = self.build_manager.known_failure(build)
+        if reason is not None:
+            log.info('Skipping known bad build %s (%s): %s', build.changeset, build.build_id, reason)
+            return True
+
+        return False
+
     def test_build(self, build):
         """
         Prepare the build directory and launch the supplied build
@@ -133,7 +162,16 @@ class Bisector(object):
         log.info('Testing build %s (%s)', build.changeset, build.build_id)
         # If persistence is enabled and a build exists, use it
         with self.build_manager.get_build(build) as build_path:
-            return self.evaluator.evaluate_testcase(build_path)
+            status = self.evaluator.evaluate_testcase(build_path)
+
+        if status == BUILD_FAILED:
+            if self.evaluator.build_incomplete:
+                # Remove the partial extraction so that the build is downloaded again
+                self.build_manager.remove_build(build)
+            elif self.evaluator.failure_reason is not None:
+                self.build_manager.mark_failed(build, self.evaluator.failure_reason)
+
+        return status
 
     def verify_bounds(self):
         """
@@ -1,15 +1,50 @@
 # coding=utf-8
 from collections import namedtuple
 from contextlib import contextmanager
+import errno
 import logging
 import os
+import platform
 import shutil
 import sqlite3
 import time
 
+from .resources import ResourceManager
+
 log = logging.getLogger('browser-bisect')
 Build = namedtuple('Build', ('path', 'stats'))
 
+# Number of times a build download is attempted before giving up
+EXTRACT_ATTEMPTS = 3
+
+
+def build_prefix(branch, build_flags):
+    """
+    Generate the prefix used to name stored builds
+    :param branch: The build branch (central, inbound, etc)
+    :param build_flags: A fuzzfetch.BuildFlags object
+    :return: The build prefix
+    """
+    return 'm-%s-%s%s' % (branch[0], platform.system().lower(), build_flags.build_string())
+
+
+def dir_size(path):
+    """
+    Recursively enumerate the size of the supplied directory
+    :param path: Path to the directory
+    :return: Size in bytes
+    """
+    total_size = 0
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            try:
+                total_size += os.path.getsize(fp)
+            except OSError:
+                log.debug('Directory became inaccessible while iterating: %s', fp)
+
+    return total_size
+
 
 class DatabaseManager(object):
     """
@@ -26,10 +61,18 @@ class DatabaseManager(object):
         :param db_path: Path to the sqlite3 database
         :type db_path: str
         """
-        self.con = sqlite3.connect(db_path)
+        # Use autocommit mode so that rows are visible to other processes immediately
+        # Transactions are explicitly started where required
+        self.con = sqlite3.connect(db_path, isolation_level=None)
         self.cur = self.con.cursor()
         self.cur.execute('CREATE TABLE IF NOT EXISTS in_use (build_path, pid INT)')
         self.cur.execute('CREATE TABLE IF NOT EXISTS download_queue (build_path TEXT primary key, pid INT)')
+        self.cur.execute('CREATE TABLE IF NOT EXISTS failed_builds '
+                         '(build_prefix TEXT, changeset TEXT, reason TEXT, timestamp REAL, '
+                         'PRIMARY KEY (build_prefix, changeset))')
+        self.cur.execute('CREATE TABLE IF NOT EXISTS reservations '
+                         '(ticket INTEGER PRIMARY KEY AUTOINCREMENT, pid INT, memory INT, cpu INT, disk INT, '
+                         'admitted INT)')
 
     def close(self):
         """
@@ -38,6 +81,7 @@ class DatabaseManager(object):
         if self.con:
             self.con.commit()
             self.con.close()
+            self.con = None
 
     def __del__(self):
         self.close()
@@ -52,27 +96,23 @@ class BuildManager(object):
         self.build_prefix = build_string
 
         self.build_dir = os.path.join(self.config.store_path, 'builds')
-        if not os.path.isdir(self.build_dir):
+        try:
             os.makedirs(self.build_dir)
+        except OSError as e:
+            # Another process or thread may have created it concurrently
+            if e.errno != errno.EEXIST or not os.path.isdir(self.build_dir):
+                raise
 
         self.pid = os.getpid()
         self.db = DatabaseManager(self.config.db_path)
+        self.resources = ResourceManager(self.config, self.db)
 
     @property
     def current_build_size(self):
         """
-        Recursively enumerate the size of the supplied build
+        Recursively enumerate the size of all stored builds
         """
-        total_size = 0
-        for dirpath, _, filenames in os.walk(self.build_dir):
-            for f in filenames:
-                fp = os.path.join(dirpath, f)
-                try:
-                    total_size += os.path.getsize(fp)
-                except OSError:
-                    log.debug('Directory became inaccessible while iterating: %s', fp)
-
-        return total_size
+        return dir_size(self.build_dir)
 
     def enumerate_builds(self):
         """
@@ -86,25 +126,148 @@ class BuildManager(object):
 
         return sorted(builds, key=lambda b: b.stats.st_atime)
 
+    def is_in_use(self, build_path):
+        """
+        Check whether the supplied build is in use or being downloaded by any process
+        :param build_path: Path to the stored build
+        :return: Boolean
+        """
+        res = self.db.cur.execute('SELECT 1 FROM in_use WHERE build_path = ? '
+                                  'UNION SELECT 1 FROM download_queue WHERE build_path = ?',
+                                  (build_path, build_path))
+        return res.fetchone() is not None
+
+    def _remove_unused(self, build_path):
+        """
+        Removes the supplied build directory unless it is in use or being downloaded by any process
+        :param build_path: Path to the stored build
+        :return: Boolean indicating whether the build was removed
+        """
+        # Claim the build in download_queue so that other processes wait for the removal to complete
+        # The directory is removed outside of the transaction to avoid holding the database lock
+        self.db.cur.execute('BEGIN IMMEDIATE TRANSACTION')
+        try:
+            claimed = not self.is_in_use(build_path)
+            if claimed:
+                self.db.cur.execute('INSERT INTO download_queue VALUES (?, ?)', (build_path, self.pid))
+        finally:
+            self.db.con.commit()
+
+        if claimed:
+            try:
+                shutil.rmtree(build_path)
+            finally:
+                self.db.cur.execute('DELETE FROM download_queue WHERE build_path = ? AND pid = ?',
+                                    (build_path, self.pid))
+
+        return claimed
+
+    def prune(self, limit):
+        """
+        Removes the least recently used builds which aren't in use until the store is below limit
+        :param limit: Maximum size of the build store in bytes
+        :return: A list of the removed build paths
+        """
+        removed = []
+        for build in self.enumerate_builds():
+            if self.current_build_size <= limit:
+                break
+
+            if self._remove_unused(build.path):
+                removed.append(build.path)
+
+        return removed
+
+    def remove_build(self, build):
+        """
+        Removes the supplied build from the store unless it is in use by another process
+        :param build: A fuzzFetch.Fetcher build object
+        :return: Boolean indicating whether the build was removed
+        """
+        build_path = self.build_path(build)
+        if not os.path.isdir(build_path):
+            return False
+
+        return self._remove_unused(build_path)
+
     def remove_old_builds(self):
         """
         Removes stored builds to make room for newer builds
         """
         while self.current_build_size > self.config.persist_limit:
-            builds = self.enumerate_builds()
-            for build in builds:
-                if self.current_build_size < self.config.persist_limit:
-                    break
+            self.prune(self.config.persist_limit)
+            time.sleep(0.1)
 
-                self.db.cur.execute('BEGIN TRANSACTION')
-                res = self.db.cur.execute('SELECT * FROM in_use, download_queue '
-                                          'WHERE in_use.build_path = ? OR download_queue.build_path = ?',
-                                          (build.path, build.path))
-                if res.fetchone() is None:
-                    shutil.rmtree(build.path)
-                self.db.con.commit()
+    def mark_failed(self, build, reason):
+        """
+        Record the supplied build as unlaunchable so that it isn't fetched again
+        :param build: A fuzzFetch.Fetcher build object
+        :param reason: Description of the failure
+        """
+        self.db.cur.execute('INSERT OR REPLACE INTO failed_builds VALUES (?, ?, ?, ?)',
+                            (self.build_prefix, build.changeset, reason, time.time()))
 
-            time.sleep(0.1)
+    def known_failure(self, build):
+        """
+        Retrieve the recorded failure reason of the supplied build
+        :param build: A fuzzFetch.Fetcher build object
+        :return: The failure reason or None if the build isn't known to fail
+        """
+        res = self.db.cur.execute('SELECT reason FROM failed_builds '
+                                  'WHERE build_prefix = ? AND changeset = ? AND timestamp > ?',
+                                  (self.build_prefix, build.changeset, time.time() - self.config.failed_expiry))
+        row = res.fetchone()
+        return row[0] if row is not None else None
+
+    def enumerate_failed(self):
+        """
+        Enumerate all unexpired failed builds
+        :return: A list of (build_prefix, changeset, reason, timestamp) tuples
+        """
+        res = self.db.cur.execute('SELECT * FROM failed_builds WHERE timestamp > ? ORDER BY timestamp',
+                                  (time.time() - self.config.failed_expiry,))
+        return res.fetchall()
+
+    def clear_failed(self, expired_only=True):
+        """
+        Remove entries from the failed build registry
+        :param expired_only: Only remove entries older than the configured expiry
+        :return: The number of removed entries
+        """
+        if expired_only:
+            self.db.cur.execute('DELETE FROM failed_builds WHERE timestamp <= ?',
+                                (time.time() - self.config.failed_expiry,))
+        else:
+            self.db.cur.execute('DELETE FROM failed_builds')
+        return self.db.cur.rowcount
+
+    def build_path(self, build):
+        """
+        Returns the storage path of the supplied build
+        :param build: A fuzzFetch.Fetcher build object
+        """
+        return os.path.join(self.build_dir, '%s-%s' % (self.build_prefix, build.changeset))
+
+    @staticmethod
+    def _extract(build, target_path):
+        """
+        Download and extract the supplied build, removing partial extractions on failure
+        :param build: A fuzzFetch.Fetcher build object
+        :param target_path: Path to extract the build to
+        """
+        for attempt in range(1, EXTRACT_ATTEMPTS + 1):
+            # Hackish - FuzzFetch can fail when downloading - retry a limited number of times
+            try:
+                build.extract_build(target_path)
+                return
+            except Exception as e:  # ToDo: Add the correct exception to catch
+                shutil.rmtree(target_path, ignore_errors=True)
+                # Retrying can't succeed when the disk is full
+                if attempt == EXTRACT_ATTEMPTS or (isinstance(e, OSError) and e.errno == errno.ENOSPC):
+                    log.error('Failed to extract build %s: %s', build.changeset, e)
+                    raise
+                log.warning('Failed to extract build %s (attempt %d/%d): %s', build.changeset, attempt,
+                            EXTRACT_ATTEMPTS, e)
 
     @contextmanager
     def get_build(self, build):
@@ -112,38 +275,35 @@ class BuildManager(object):
         Retrieve the build matching the supplied revision
         :param build: A fuzzFetch.Fetcher build object
         """
-        target_path = os.path.join(self.build_dir, '%s-%s' % (self.build_prefix, build.changeset))
+        target_path = self.build_path(build)
 
         try:
             # Insert build_path into in_use to prevent deletion
             self.db.cur.execute('INSERT INTO in_use VALUES (?, ?)', (target_path, self.pid))
 
             # Try to insert the build_path into download_queue
-            # If the insert fails, another process is already downloading it
-            # Poll the database until it complete
-            try:
+            # If the insert fails, another process is already downloading or removing it
+            # Poll the database until it completes and try again
+            while True:
                 self.db.cur.execute('INSERT OR IGNORE INTO download_queue VALUES (?, ?)', (target_path, self.pid))
                 if self.db.cur.rowcount == 1:
-                    # If the build doesn't exist on disk, download it
-                    if not os.path.isdir(target_path):
-                        self.remove_old_builds()
-                        while True:
-                            # Hackish - FuzzFetch can fail when downloading - try until success
-                            try:
-                                build.extract_build(target_path)
-                                break
-                            except Exception:  # ToDo: Add the correct exception to catch
-                                pass
-                else:
-                    while True:
-                        res = self.db.cur.execute('SELECT * FROM download_queue WHERE build_path = ?', (target_path,))
-                        if res.fetchone() is None:
-                            break
-                        else:
-                            time.sleep(0.1)
-            finally:
-                self.db.cur.execute('DELETE FROM download_queue WHERE build_path = ? AND pid = ?',
-                                    (target_path, self.pid))
+                    try:
+                        # If the build doesn't exist on disk, download it
+                        if not os.path.isdir(target_path):
+                            self.remove_old_builds()
+                            with self.resources.reserve(disk=self.config.build_size):
+                                self._extract(build, target_path)
+                    finally:
+                        self.db.cur.execute('DELETE FROM download_queue WHERE build_path = ? AND pid = ?',
+                                            (target_path, self.pid))
+                    break
+
+                while True:
+                    res = self.db.cur.execute('SELECT * FROM download_queue WHERE build_path = ?', (target_path,))
+                    if res.fetchone() is None:
+                        break
+                    else:
+                        time.sleep(0.1)
 
             yield target_path
         finally:
@@ -8,68 +8,213 @@
 
 from __future__ import absolute_import, division, print_function
 
+import bisect
+import calendar
 import copy
 import logging
+from array import array
 from datetime import timedelta
 
 log = logging.getLogger('builds')
 
 
+def _timestamp(dt):
+    """
+    Convert the supplied datetime to seconds since the epoch
+    :param dt: A naive UTC datetime object
+    :type dt: datetime.datetime
+    """
+    return calendar.timegm(dt.utctimetuple()) + dt.microsecond / 1e6
+
+
 class BuildRange(object):
     """
-    A class for storing a range of builds or build representations
+    A class for storing a sorted range of builds or build representations
+
+    Builds are stored as parallel arrays of timestamps and ids and are only materialised using the optional loader
+    when accessed.  Slices are views sharing the underlying storage.  Removed builds are tracked using a mask and a
+    Fenwick tree of removed counts so that indices always refer to the remaining builds.
     """
-    def __init__(self, builds):
-        self._builds = builds
+    def __init__(self, timestamps, ids, loader=None):
+        """
+        :param timestamps: Build timestamps in seconds since the epoch sorted in ascending order
+        :param ids: Build ids corresponding to timestamps
+        :param loader: Optional callable returning the build object for a build id
+        """
+        if len(timestamps) != len(ids):
+            raise ValueError('timestamps and ids must be of equal length')
+
+        self._timestamps = array('d', timestamps)
+        self._ids = list(ids)
+        self._loader = loader
+        # Materialised builds keyed by absolute position
+        self._builds = {}
+        self._mask = bytearray(b'\x01') * len(self._ids)
+        # 1-based Fenwick tree holding the number of removed builds
+        self._removed = array('l', [0]) * (len(self._ids) + 1)
+        self._start = 0
+        self._stop = len(self._ids)
 
     def __len__(self):
-        return len(self._builds)
+        return (self._stop - self._start) - (self._removed_before(self._stop) - self._removed_before(self._start))
 
-    def __getslice__(self, smin, smax):
-        new_range = copy.copy(self)
-        new_range._builds = self._builds[smin:smax]
-        return new_range
+    def __iter__(self):
+        for pos in range(self._start, self._stop):
+            if self._mask[pos]:
+                yield self._materialise(pos)
 
     def __getitem__(self, i):
-        return self._builds[i].build_info
+        if isinstance(i, slice):
+            start, stop, step = i.indices(len(self))
+            if step != 1:
+                raise ValueError('BuildRange does not support extended slicing')
+            new_range = copy.copy(self)
+            new_range._start = self._position(start) if start < len(self) else self._stop
+            new_range._stop = self._position(stop) if stop < len(self) else self._stop
+            new_range._stop = max(new_range._start, new_range._stop)
+            # Release builds materialised outside of the new view
+            new_range._builds = dict((pos, build) for pos, build in self._builds.items()
+                                     if new_range._start <= pos < new_range._stop)
+            return new_range
+
+        return self._materialise(self._position(i))
+
+    def _removed_before(self, pos):
+        """
+        Returns the number of removed builds preceding the supplied position
+        :param pos: A position in the underlying storage
+        """
+        total = 0
+        while pos > 0:
+            total += self._removed[pos]
+            pos &= pos - 1
+        return total
+
+    def _position(self, i):
+        """
+        Convert an index relative to the remaining builds of this range into a position in the underlying storage
+        :param i: An index within this range
+        """
+        length = len(self)
+        if i < 0:
+            i += length
+        if not 0 <= i < length:
+            raise IndexError('BuildRange index out of range')
+
+        # Locate the i-th remaining build after the start of the view by descending the Fenwick tree
+        rank = (self._start - self._removed_before(self._start)) + i
+        pos = 0
+        step = 1 << (len(self._ids).bit_length() - 1)
+        while step:
+            nxt = pos + step
+            if nxt <= len(self._ids) and step - self._removed[nxt] <= rank:
+                pos = nxt
+                rank -= step - self._removed[nxt]
+            step >>= 1
+
+        return pos
+
+    def _materialise(self, pos):
+        """
+        Returns the build stored at the supplied position, loading it if required
+        :param pos: A position in the underlying storage
+        """
+        if pos not in self._builds:
+            build_id = self._ids[pos]
+            self._builds[pos] = self._loader(build_id) if self._loader is not None else build_id
+
+        return self._builds[pos]
+
+    @property
+    def ids(self):
+        """
+        Returns the ids of all remaining builds
+        """
+        return [self._ids[pos] for pos in range(self._start, self._stop) if self._mask[pos]]
 
     @property
-    def builds(self):
+    def mid_index(self):
         """
-        Returns the "builds" list
+        Returns the index of the midpoint of the remaining builds
         """
-        return self._builds
+        if not self:
+            raise IndexError('BuildRange is empty')
+
+        return len(self) // 2
 
     @property
     def mid_point(self):
         """
-        Returns the midpoint of the "builds" list
+        Returns the build at the midpoint of the remaining builds
         """
-        return self._builds[len(self) // 2]
+        return self[self.mid_index]
 
-    def index(self, build):
+    def build_id(self, i):
+        """
+        Returns the id of the build at the supplied index without materialising it
+        :param i: An index within this range
+        """
+        return self._ids[self._position(i)]
+
+    def index(self, build_datetime):
+        """
+        Returns the index of the build with the provided datetime
+        Used to locate a known build, such as a bisection boundary, without materialising the range
+        :param build_datetime: The datetime of a build within the range
+        :type build_datetime: datetime.datetime
         """
-        Returns the index of the provided build
-        :param build: An object within the "builds" list
+        timestamp = _timestamp(build_datetime)
+        pos = bisect.bisect_left(self._timestamps, timestamp, self._start, self._stop)
+        if pos == self._stop or self._timestamps[pos] != timestamp or not self._mask[pos]:
+            raise ValueError('%s is not in BuildRange' % build_datetime)
+
+        return (pos - self._removed_before(pos)) - (self._start - self._removed_before(self._start))
+
+    def remove(self, i):
+        """
+        Removes the build at the supplied index from the range
+        :param i: An index within this range
+        """
+        pos = self._position(i)
+        self._mask[pos] = 0
+        self._builds.pop(pos, None)
+
+        node = pos + 1
+        while node <= len(self._ids):
+            self._removed[node] += 1
+            node += node & -node
+
+    @classmethod
+    def from_builds(cls, builds, loader):
+        """
+        Creates a range from an iterable of builds, storing only their timestamps and changesets
+        :param builds: An iterable of fuzzfetch.Fetcher objects
+        :param loader: Callable returning the build object for a changeset
+        :return: A BuildRange object
         """
-        return self.builds.index(build)
+        entries = sorted((_timestamp(b.build_datetime), b.changeset) for b in builds)
+        return cls([e[0] for e in entries], [e[1] for e in entries], loader)
 
     @classmethod
-    def new(cls, start, end):
+    def new(cls, start, end, loader=None):
         """
         Creates a list of builds between two ranges
         :param start: A starting datetime object
         :type start: datetime.datetime
         :param end: An ending datetime object
         :type end: datetime.datetime
+        :param loader: Optional callable returning the build object for a date string
         :return: A BuildRange object
         """
+        timestamps = []
         dates = []
         # Remove time date
         start = start.replace(hour=0, minute=0, second=0, microsecond=0)
         end = end.replace(hour=0, minute=0, second=0, microsecond=0)
         delta = end - start
         for offset in range(delta.days + 1):
-            dates.append((start + timedelta(days=offset)).strftime('%Y-%m-%d'))
+            date = start + timedelta(days=offset)
+            timestamps.append(_timestamp(date))
+            dates.append(date.strftime('%Y-%m-%d'))
 
-        return cls(dates)
+        return cls(timestamps, dates, loader)
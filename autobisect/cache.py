@@ -0,0 +1,156 @@
+# coding=utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+import logging
+import os
+import time
+from datetime import datetime
+from multiprocessing.pool import ThreadPool
+
+from .build_manager import BuildManager, build_prefix, dir_size
+from .builds import BuildRange
+from .config import BisectionConfig
+
+log = logging.getLogger('cache')
+
+
+def _format_size(size):
+    """
+    Format the supplied size in MBs
+    :param size: Size in bytes
+    """
+    return '%.1f MB' % (size / (1024.0 * 1024.0))
+
+
+def _format_time(timestamp):
+    """
+    Format the supplied timestamp
+    :param timestamp: Seconds since the epoch
+    """
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp))
+
+
+def warm(args):
+    """
+    Download all builds matching the supplied branch and build flags within the supplied date range
+    """
+    # Only pay for importing fuzzfetch when builds are actually fetched
+    from fuzzfetch import BuildFlags, Fetcher, FetcherException
+
+    config = BisectionConfig(args.config)
+    if not config.persist:
+        log.error('Build persistence is disabled, warmed builds would be removed immediately')
+        return
+
+    build_flags = BuildFlags(asan=args.asan, debug=args.debug, fuzzing=args.fuzzing, coverage=args.coverage)
+    prefix = build_prefix(args.branch, build_flags)
+
+    start = datetime.strptime(args.start, '%Y-%m-%d')
+    end = datetime.strptime(args.end, '%Y-%m-%d')
+
+    # Create the build directory and database before starting any workers
+    build_manager = BuildManager(config, prefix)
+
+    builds = []
+    for date in BuildRange.new(start, end).ids:
+        try:
+            found = list(Fetcher.iterall(args.build_target, args.branch, date, build_flags))
+        except FetcherException:
+            log.warning('Unable to find builds for %s', date)
+        else:
+            log.info('Found %d build(s) for %s', len(found), date)
+            for build in found:
+                reason = build_manager.known_failure(build)
+                if reason is not None:
+                    log.info('Skipping known bad build %s (%s): %s', build.changeset, build.build_id, reason)
+                else:
+                    builds.append(build)
+
+    # Stored builds are counted using their actual size and missing builds using the configured estimate
+    estimate = 0
+    for build in builds:
+        build_path = build_manager.build_path(build)
+        estimate += dir_size(build_path) if os.path.isdir(build_path) else config.build_size
+    if estimate > config.persist_limit:
+        message = 'Estimated size of %d build(s) (%s) exceeds persist-limit (%s)'
+        if not args.force:
+            log.error(message + ', narrow the date range or use --force', len(builds),
+                      _format_size(estimate), _format_size(config.persist_limit))
+            return
+        log.warning(message + ', earlier builds will be evicted', len(builds), _format_size(estimate),
+                    _format_size(config.persist_limit))
+
+    def fetch(build):
+        # sqlite connections can't be shared between threads so each download uses its own manager
+        build_manager = BuildManager(config, prefix)
+        try:
+            with build_manager.get_build(build) as build_path:
+                log.info('Cached %s (%s) in %s', build.changeset, build.build_id, build_path)
+        finally:
+            build_manager.db.close()
+
+    log.info('Warming cache with %d build(s) using %d job(s)', len(builds), args.jobs)
+    pool = ThreadPool(args.jobs)
+    try:
+        pool.map(fetch, builds)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def show(args):
+    """
+    List all stored builds including their size and last use
+    """
+    build_manager = BuildManager(BisectionConfig(args.config), None)
+    for build in build_manager.enumerate_builds():
+        log.info('%s  %10s  %s', _format_time(build.stats.st_atime), _format_size(dir_size(build.path)),
+                 os.path.basename(build.path))
+
+
+def stats(args):
+    """
+    Display a summary of the build store
+    """
+    config = BisectionConfig(args.config)
+    build_manager = BuildManager(config, None)
+    builds = build_manager.enumerate_builds()
+
+    log.info('Storage path: %s', build_manager.build_dir)
+    log.info('Stored builds: %d', len(builds))
+    log.info('Total size: %s (limit: %s)', _format_size(build_manager.current_build_size),
+             _format_size(config.persist_limit))
+    if builds:
+        log.info('Least recently used: %s', _format_time(builds[0].stats.st_atime))
+        log.info('Most recently used: %s', _format_time(builds[-1].stats.st_atime))
+
+
+def prune(args):
+    """
+    Remove the least recently used builds until the store is within the limit
+    """
+    config = BisectionConfig(args.config)
+    limit = args.limit * 1024 * 1024 if args.limit is not None else config.persist_limit
+    build_manager = BuildManager(config, None)
+
+    removed = build_manager.prune(limit)
+    for build_path in removed:
+        log.info('Removed %s', os.path.basename(build_path))
+
+    log.info('Removed %d build(s), %s remaining', len(removed), _format_size(build_manager.current_build_size))
+
+
+def failed(args):
+    """
+    List or clear builds which are known to fail to launch
+    """
+    build_manager = BuildManager(BisectionConfig(args.config), None)
+    if args.clear or args.clear_expired:
+        removed = build_manager.clear_failed(expired_only=args.clear_expired)
+        log.info('Removed %d failed build(s)', removed)
+        return
+
+    for prefix, changeset, reason, timestamp in build_manager.enumerate_failed():
+        log.info('%s  %s-%s  %s', _format_time(timestamp), prefix, changeset, reason)
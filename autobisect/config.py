@@ -14,6 +14,16 @@ storage-path: %s
 persist: true
 ; size in MBs
 persist-limit: 30000
+; days before a build which failed to launch is retried
+failed-expiry: 30
+; host limits shared by all autobisect processes (0 uses the whole host)
+; memory in MBs
+max-memory: 0
+max-cpu: 0
+; memory in MBs reserved per browser launch when --memory isn't supplied
+launch-memory: 2048
+; disk space in MBs reserved per build extraction
+build-size: 1024
 """ % CONFIG_DIR
 
 
@@ -42,6 +52,11 @@ class BisectionConfig(object):
             persist_limit = config_obj.getint('autobisect', 'persist-limit') * 1024 * 1024
             self.persist_limit = persist_limit if self.persist else 0
             self.store_path = config_obj.get('autobisect', 'storage-path')
+            self.failed_expiry = config_obj.getint('autobisect', 'failed-expiry', fallback=30) * 24 * 60 * 60
+            self.max_memory = config_obj.getint('autobisect', 'max-memory', fallback=0) * 1024 * 1024
+            self.max_cpu = config_obj.getint('autobisect', 'max-cpu', fallback=0)
+            self.launch_memory = config_obj.getint('autobisect', 'launch-memory', fallback=2048) * 1024 * 1024
+            self.build_size = config_obj.getint('autobisect', 'build-size', fallback=1024) * 1024 * 1024
         except configparser.NoOptionError as e:
             log.critical('Unable to parse configuration file: %s', e.message)
             raise
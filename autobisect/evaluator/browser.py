@@ -21,7 +21,14 @@ class BrowserBisector(object):
     """
     Testcase evaluator for Firefox
     """
-    def __init__(self, args):
+    def __init__(self, args, resources, launch_memory):
+        """
+        :param args: Parsed command line arguments
+        :param resources: A ResourceManager object used to reserve host resources before launching
+        :param launch_memory: Memory in bytes reserved per launch when no memory limit is supplied
+        """
+        self.resources = resources
+
         self.testcase = os.path.abspath(args.testcase)
         self.count = args.count
 
@@ -36,12 +43,18 @@ class BrowserBisector(object):
         self._prefs = args.prefs
         self._profile = os.path.abspath(args.profile) if args.profile is not None else None
         self._memory = args.memory * 1024 * 1024 if args.memory else 0
+        self._reserved_memory = self._memory or launch_memory
+
+        # Description of the last BUILD_FAILED result if it is caused by the build
+        self.failure_reason = None
+        # Whether the last BUILD_FAILED result was caused by an incomplete build directory
+        self.build_incomplete = False
 
     def verify_build(self, binary):
         """
         Verify that build doesn't crash on start
         :param binary: The path to the target binary
-        :return: Boolean
+        :return: The return code or None if the browser failed to launch
         """
         _, test_path = tempfile.mkstemp(prefix='autobisect-dummy')
         try:
@@ -53,20 +66,39 @@ class BrowserBisector(object):
         finally:
             os.remove(test_path)
 
-        if status != 0:
+        if status is None:
+            log.error('>> Build failed to launch!')
+        elif status != 0:
             log.error('>> Build crashed!')
-            return False
 
-        return True
+        return status
 
     def evaluate_testcase(self, build_path):
         """
         Validate build and launch with supplied testcase
         :return: Result of evaluation
         """
-        binary = os.path.join(build_path, 'dist', 'bin', 'firefox')
-        if os.path.isfile(binary) and self.verify_build(binary):
+        self.failure_reason = None
+        self.build_incomplete = False
 
+        binary = os.path.join(build_path, 'dist', 'bin', 'firefox')
+        if not os.path.isfile(binary):
+            log.error('> Binary not found!')
+            self.build_incomplete = True
+            return BUILD_FAILED
+
+        status = self.verify_build(binary)
+        if status is None:
+            # Launch failures and timeouts may be caused by an overloaded host
+            # Launch once more under a fresh reservation before blaming the build
+            log.info('> Retrying launch...')
+            status = self.verify_build(binary)
+
+        if status is None:
+            self.failure_reason = 'Build failed to launch'
+        elif status != 0:
+            self.failure_reason = 'Build crashed on start'
+        else:
             result = 0
             for _ in range(self.count):
                 log.info('> Launching build with testcase...')
@@ -89,24 +121,25 @@ class BrowserBisector(object):
         :param testcase: The path to the testcase
         :return: The return code or None
         """
-        ffp = FFPuppet(use_gdb=self._use_gdb, use_valgrind=self._use_valgrind, use_xvfb=self._use_xvfb)
-        for a_token in self._abort_token:
-            ffp.add_abort_token(a_token)
-
-        try:
-            ffp.launch(
-                str(binary),
-                location=testcase,
-                launch_timeout=self._launch_timeout,
-                memory_limit=self._memory,
-                prefs_js=self._prefs,
-                extension=self._extension)
-            return_code = ffp.wait(self._timeout) or 0
-            log.info('>> Browser execution status: %s', return_code)
-        except LaunchError:
-            log.warn('> Failed to start browser')
-            return_code = None
-        finally:
-            ffp.clean_up()
+        with self.resources.reserve(memory=self._reserved_memory, cpu=1):
+            ffp = FFPuppet(use_gdb=self._use_gdb, use_valgrind=self._use_valgrind, use_xvfb=self._use_xvfb)
+            for a_token in self._abort_token:
+                ffp.add_abort_token(a_token)
+
+            try:
+                ffp.launch(
+                    str(binary),
+                    location=testcase,
+                    launch_timeout=self._launch_timeout,
+                    memory_limit=self._memory,
+                    prefs_js=self._prefs,
+                    extension=self._extension)
+                return_code = ffp.wait(self._timeout) or 0
+                log.info('>> Browser execution status: %s', return_code)
+            except LaunchError:
+                log.warn('> Failed to start browser')
+                return_code = None
+            finally:
+                ffp.clean_up()
 
         return return_code
@@ -10,8 +10,6 @@ import re
 import time
 from datetime import datetime, timedelta
 
-from .bisect import Bisector
-
 log = logging.getLogger('autobisect')
 
 
@@ -30,21 +28,11 @@ def _parse_args(argv=None):
     parser = argparse.ArgumentParser(
         description='Autobisection tool for Mozilla Firefox and Spidermonkey')
 
-    global_args = argparse.ArgumentParser(add_help=False)
-    global_args.add_argument('testcase', action=ExpandPath, help='Path to testcase')
-
-    boundary_args = global_args.add_argument_group('boundary arguments (YYYY-MM-DD or SHA1 revision')
-    boundary_args.add_argument('--start', default=(datetime.utcnow()-timedelta(days=364)).strftime('%Y-%m-%d'),
-                               help='Start revision (default: earliest available TC build)')
-    boundary_args.add_argument('--end', default=datetime.utcnow().strftime('%Y-%m-%d'),
-                               help='End revision (default: latest available TC build)')
+    config_args = argparse.ArgumentParser(add_help=False)
+    config_args.add_argument('--config', action=ExpandPath, help='Path to optional config file')
 
-    bisection_args = global_args.add_argument_group('bisection arguments')
-    bisection_args.add_argument('--count', type=int, default=1, help='Number of times to evaluate testcase (per build)')
-    bisection_args.add_argument('--find-fix', action='store_true', help='Indentify fix date')
-    bisection_args.add_argument('--config', action=ExpandPath, help='Path to optional config file')
-
-    branch_args = global_args.add_argument_group('Branch')
+    build_selection_args = argparse.ArgumentParser(add_help=False)
+    branch_args = build_selection_args.add_argument_group('Branch')
     branch_selector = branch_args.add_mutually_exclusive_group()
     branch_selector.add_argument('--inbound', action='store_const', const='inbound', dest='branch',
                                  help='Download from mozilla-inbound')
@@ -57,7 +45,7 @@ def _parse_args(argv=None):
     branch_selector.add_argument('--esr', action='store_const', const='esr52', dest='branch',
                                  help='Download from mozilla-esr52')
 
-    build_args = global_args.add_argument_group('build arguments')
+    build_args = build_selection_args.add_argument_group('build arguments')
     build_args.add_argument('--asan', action='store_true', help='Test asan builds')
     build_args.add_argument('--debug', action='store_true', help='Test debug builds')
     build_args.add_argument('--fuzzing', action='store_true', help='Test --enable-fuzzing builds')
@@ -65,6 +53,20 @@ def _parse_args(argv=None):
     build_args.add_argument('--32', dest='arch_32', action='store_true',
                             help='Test 32 bit version of browser on 64 bit system.')
 
+    global_args = argparse.ArgumentParser(add_help=False, parents=[build_selection_args])
+    global_args.add_argument('testcase', action=ExpandPath, help='Path to testcase')
+
+    boundary_args = global_args.add_argument_group('boundary arguments (YYYY-MM-DD or SHA1 revision')
+    boundary_args.add_argument('--start', default=(datetime.utcnow()-timedelta(days=364)).strftime('%Y-%m-%d'),
+                               help='Start revision (default: earliest available TC build)')
+    boundary_args.add_argument('--end', default=datetime.utcnow().strftime('%Y-%m-%d'),
+                               help='End revision (default: latest available TC build)')
+
+    bisection_args = global_args.add_argument_group('bisection arguments')
+    bisection_args.add_argument('--count', type=int, default=1, help='Number of times to evaluate testcase (per build)')
+    bisection_args.add_argument('--find-fix', action='store_true', help='Indentify fix date')
+    bisection_args.add_argument('--config', action=ExpandPath, help='Path to optional config file')
+
     subparsers = parser.add_subparsers(dest='target')
     firefox_sub = subparsers.add_parser('firefox', parents=[global_args], help='Perform bisection for Firefox builds')
     ffp_args = firefox_sub.add_argument_group('launcher arguments')
@@ -86,14 +88,57 @@ def _parse_args(argv=None):
     js_args = subparsers.add_parser('js', parents=[global_args], help='Perform bisection for SpiderMonkey builds')
     js_args.add_argument('--foo', required=True, help='Foo')
 
-    args = parser.parse_args(argv)
+    cache_sub = subparsers.add_parser('cache', help='Manage stored builds')
+    cache_subparsers = cache_sub.add_subparsers(dest='cache_command')
+    cache_subparsers.required = True
+
+    warm_sub = cache_subparsers.add_parser('warm', parents=[config_args, build_selection_args],
+                                           help='Download all builds within a date range')
+    warm_args = warm_sub.add_argument_group('warm arguments')
+    warm_args.add_argument('--target', dest='build_target', choices=['firefox', 'js'], default='firefox',
+                           help='Build target (default: %(default)s)')
+    warm_args.add_argument('--start', default=(datetime.utcnow()-timedelta(days=7)).strftime('%Y-%m-%d'),
+                           help='Start date (YYYY-MM-DD) (default: %(default)s)')
+    warm_args.add_argument('--end', default=datetime.utcnow().strftime('%Y-%m-%d'),
+                           help='End date (YYYY-MM-DD) (default: %(default)s)')
+    warm_args.add_argument('--jobs', type=int, default=4,
+                           help='Number of builds to download in parallel (default: %(default)s)')
+    warm_args.add_argument('--force', action='store_true',
+                           help='Download builds even if they are expected to exceed persist-limit')
+
+    cache_subparsers.add_parser('list', parents=[config_args], help='List stored builds')
+    cache_subparsers.add_parser('stats', parents=[config_args], help='Display build store statistics')
+
+    prune_sub = cache_subparsers.add_parser('prune', parents=[config_args],
+                                            help='Remove least recently used builds')
+    prune_sub.add_argument('--limit', type=int,
+                           help='Size in MBs to prune the build store to (default: persist-limit)')
+
+    failed_sub = cache_subparsers.add_parser('failed', parents=[config_args],
+                                             help='List or clear builds which failed to launch')
+    failed_selector = failed_sub.add_mutually_exclusive_group()
+    failed_selector.add_argument('--clear', action='store_true', help='Remove all entries')
+    failed_selector.add_argument('--clear-expired', action='store_true', help='Remove expired entries')
 
-    if not re.match(r'^[0-9[a-f]{12,40}$|^[0-9]{4}-[0-9]{2}-[0-9]{2}$', args.start):
-        parser.error('Invalid start value supplied')
-    if not re.match(r'^[0-9[a-f]{12,40}$|^[0-9]{4}-[0-9]{2}-[0-9]{2}$', args.end):
-        parser.error('Invalid end value supplied')
+    args = parser.parse_args(argv)
 
-    if args.branch is None:
+    if args.target is None:
+        parser.error('No target specified')
+
+    if args.target == 'cache':
+        if args.cache_command == 'warm':
+            for value in (args.start, args.end):
+                if not re.match(r'^[0-9]{4}-[0-9]{2}-[0-9]{2}$', value):
+                    parser.error('Invalid date supplied: %s' % value)
+            if args.jobs < 1:
+                parser.error('--jobs must be at least 1')
+    else:
+        if not re.match(r'^[0-9[a-f]{12,40}$|^[0-9]{4}-[0-9]{2}-[0-9]{2}$', args.start):
+            parser.error('Invalid start value supplied')
+        if not re.match(r'^[0-9[a-f]{12,40}$|^[0-9]{4}-[0-9]{2}-[0-9]{2}$', args.end):
+            parser.error('Invalid end value supplied')
+
+    if hasattr(args, 'branch') and args.branch is None:
         args.branch = 'central'
 
     return args
@@ -113,6 +158,21 @@ def main(argv=None):
 
     args = _parse_args(argv)
 
+    if args.target == 'cache':
+        from . import cache
+        commands = {
+            'warm': cache.warm,
+            'list': cache.show,
+            'stats': cache.stats,
+            'prune': cache.prune,
+            'failed': cache.failed,
+        }
+        commands[args.cache_command](args)
+        return
+
+    # Defer importing fuzzfetch and ffpuppet until a bisection is actually performed
+    from .bisect import Bisector
+
     bisector = Bisector(args)
     start_time = time.time()
     bisector.bisect()
@@ -0,0 +1,193 @@
+# coding=utf-8
+#
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this file,
+# You can obtain one at http://mozilla.org/MPL/2.0/.
+from contextlib import contextmanager
+import errno
+import logging
+import multiprocessing
+import os
+import sqlite3
+import time
+
+log = logging.getLogger('resources')
+
+
+def total_memory():
+    """
+    Retrieve the amount of physical memory available to the host
+    :return: Size in bytes or None if it can't be determined
+    """
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def pid_exists(pid):
+    """
+    Check whether a process with the supplied pid is running
+    :param pid: A process id
+    :return: Boolean
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError as e:
+        return e.errno == errno.EPERM
+
+    return True
+
+
+class ResourceManager(object):
+    """
+    Host level admission control for memory, cpu and disk shared by all autobisect processes
+    """
+    def __init__(self, config, db):
+        """
+        :param config: A BisectionConfig object
+        :param db: A DatabaseManager object
+        """
+        self.config = config
+        self.db = db
+        self.pid = os.getpid()
+
+        self.max_memory = self.config.max_memory or total_memory()
+        self.max_cpu = self.config.max_cpu or multiprocessing.cpu_count()
+
+    @property
+    def available_disk(self):
+        """
+        Returns the free space of the build storage volume
+        """
+        stats = os.statvfs(self.config.store_path)
+        return stats.f_bavail * stats.f_frsize
+
+    def _transaction(self, func, *args):
+        """
+        Run the supplied function within an immediate transaction, retrying while the database is locked
+        :param func: Callable performing the queries
+        :return: The result of func
+        """
+        while True:
+            try:
+                self.db.cur.execute('BEGIN IMMEDIATE TRANSACTION')
+                result = func(*args)
+                self.db.con.commit()
+                return result
+            except sqlite3.OperationalError as e:
+                self.db.con.rollback()
+                if 'locked' not in str(e):
+                    raise
+                log.debug('Database is locked, retrying...')
+                time.sleep(0.1)
+            except Exception:
+                self.db.con.rollback()
+                raise
+
+    def stale_pids(self):
+        """
+        Returns the pids holding tickets which are no longer running
+        """
+        res = self.db.cur.execute('SELECT DISTINCT pid FROM reservations')
+        return [row[0] for row in res.fetchall() if not pid_exists(row[0])]
+
+    def remove_stale(self):
+        """
+        Remove tickets held by processes which are no longer running
+        """
+        for pid in self.stale_pids():
+            log.debug('Removing reservations of exited process %d', pid)
+            self.db.cur.execute('DELETE FROM reservations WHERE pid = ?', (pid,))
+
+    def _enqueue(self, memory, cpu, disk):
+        """
+        Add a waiting ticket to the end of the queue
+        :return: The ticket number
+        """
+        self.db.cur.execute('INSERT INTO reservations (pid, memory, cpu, disk, admitted) VALUES (?, ?, ?, ?, 0)',
+                            (self.pid, memory, cpu, disk))
+        return self.db.cur.lastrowid
+
+    def _ready(self, ticket, memory, cpu, disk):
+        """
+        Check whether the ticket is at the head of the queue and the requested resources fit the remaining budget
+        """
+        res = self.db.cur.execute('SELECT MIN(ticket) FROM reservations WHERE admitted = 0')
+        if res.fetchone()[0] != ticket:
+            return False
+
+        res = self.db.cur.execute('SELECT COUNT(*), TOTAL(memory), TOTAL(cpu), TOTAL(disk) FROM reservations '
+                                  'WHERE admitted = 1')
+        count, used_memory, used_cpu, used_disk = res.fetchone()
+
+        if count == 0:
+            # Nothing else will release disk space so a request which doesn't fit now would block the queue forever
+            if disk and disk > self.available_disk:
+                raise OSError(errno.ENOSPC, 'Insufficient disk space to reserve %d bytes' % disk)
+            # Otherwise always admit a request when nothing else is running to prevent it from waiting forever
+            return True
+
+        if self.max_memory is not None and used_memory + memory > self.max_memory:
+            return False
+        if used_cpu + cpu > self.max_cpu:
+            return False
+        if disk and used_disk + disk > self.available_disk:
+            return False
+
+        return True
+
+    def _admit(self, ticket, memory, cpu, disk):
+        """
+        Admit the ticket if it is still ready
+        Must be called within a transaction
+        :return: Boolean
+        """
+        if not self._ready(ticket, memory, cpu, disk):
+            return False
+
+        self.db.cur.execute('UPDATE reservations SET admitted = 1 WHERE ticket = ?', (ticket,))
+        return True
+
+    def _release(self, ticket):
+        """
+        Remove the supplied ticket from the queue
+        """
+        self.db.cur.execute('DELETE FROM reservations WHERE ticket = ?', (ticket,))
+
+    @contextmanager
+    def reserve(self, memory=0, cpu=0, disk=0):
+        """
+        Reserve the supplied resources, waiting in a first in, first out queue until they are available
+        Raises OSError (ENOSPC) if the disk space can't become available
+        :param memory: Memory in bytes
+        :param cpu: Number of cpu cores
+        :param disk: Disk space in bytes
+        """
+        ticket = self._transaction(self._enqueue, memory, cpu, disk)
+        try:
+            waiting = False
+            while True:
+                # Poll using read only queries and only take the write lock once the ticket may be admitted
+                try:
+                    stale = self.stale_pids()
+                    ready = not stale and self._ready(ticket, memory, cpu, disk)
+                except sqlite3.OperationalError as e:
+                    if 'locked' not in str(e):
+                        raise
+                    stale, ready = [], False
+
+                if stale:
+                    self._transaction(self.remove_stale)
+                    continue
+                if ready and self._transaction(self._admit, ticket, memory, cpu, disk):
+                    break
+
+                if not waiting:
+                    log.info('Waiting for host resources to become available...')
+                    waiting = True
+                time.sleep(1)
+
+            yield
+        finally:
+            self._transaction(self._release, ticket)
@@ -0,0 +1,18 @@
+# coding=utf-8
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import pytest
+
+from autobisect.config import BisectionConfig
+
+
+@pytest.fixture
+def config(tmp_path):
+    config_file = tmp_path / 'autobisect.ini'
+    config_file.write_text(u'[autobisect]\n'
+                           u'storage-path: %s\n'
+                           u'persist: true\n'
+                           u'persist-limit: 1000\n'
+                           u'failed-expiry: 30\n' % tmp_path)
+    return BisectionConfig(str(config_file))
@@ -0,0 +1,92 @@
+# coding=utf-8
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import errno
+
+import pytest
+
+from autobisect.build_manager import EXTRACT_ATTEMPTS, BuildManager
+
+
+class FakeBuild(object):
+    def __init__(self, changeset):
+        self.changeset = changeset
+
+
+def _expire(build_manager, changeset):
+    build_manager.db.cur.execute('UPDATE failed_builds SET timestamp = timestamp - ? WHERE changeset = ?',
+                                 (build_manager.config.failed_expiry + 1, changeset))
+
+
+def test_mark_failed(config):
+    build_manager = BuildManager(config, 'm-c-linux-asan')
+    build = FakeBuild('abc')
+    assert build_manager.known_failure(build) is None
+
+    build_manager.mark_failed(build, 'Build failed to launch')
+    assert build_manager.known_failure(build) == 'Build failed to launch'
+
+    build_manager.mark_failed(build, 'Build crashed on start')
+    assert build_manager.known_failure(build) == 'Build crashed on start'
+    assert len(build_manager.enumerate_failed()) == 1
+
+
+def test_failure_is_per_prefix(config):
+    BuildManager(config, 'm-c-linux-asan').mark_failed(FakeBuild('abc'), 'Build crashed on start')
+    assert BuildManager(config, 'm-c-linux-debug').known_failure(FakeBuild('abc')) is None
+    assert BuildManager(config, 'm-c-linux-asan').known_failure(FakeBuild('abc')) == 'Build crashed on start'
+
+
+def test_known_failure_expiry(config):
+    build_manager = BuildManager(config, 'm-c-linux-asan')
+    build_manager.mark_failed(FakeBuild('abc'), 'Build crashed on start')
+    _expire(build_manager, 'abc')
+    assert build_manager.known_failure(FakeBuild('abc')) is None
+    assert build_manager.enumerate_failed() == []
+
+
+def test_clear_failed_expired_only(config):
+    build_manager = BuildManager(config, 'm-c-linux-asan')
+    build_manager.mark_failed(FakeBuild('old'), 'Build crashed on start')
+    build_manager.mark_failed(FakeBuild('new'), 'Build failed to launch')
+    _expire(build_manager, 'old')
+
+    assert build_manager.clear_failed(expired_only=True) == 1
+    assert build_manager.known_failure(FakeBuild('new')) == 'Build failed to launch'
+    assert build_manager.db.cur.execute('SELECT changeset FROM failed_builds').fetchall() == [('new',)]
+
+
+def test_clear_failed_all(config):
+    build_manager = BuildManager(config, 'm-c-linux-asan')
+    build_manager.mark_failed(FakeBuild('old'), 'Build crashed on start')
+    build_manager.mark_failed(FakeBuild('new'), 'Build failed to launch')
+    _expire(build_manager, 'old')
+
+    assert build_manager.clear_failed(expired_only=False) == 2
+    assert build_manager.known_failure(FakeBuild('new')) is None
+
+
+class FailingBuild(FakeBuild):
+    def __init__(self, error):
+        super(FailingBuild, self).__init__('abc')
+        self.error = error
+        self.attempts = 0
+
+    def extract_build(self, path):
+        self.attempts += 1
+        raise self.error
+
+
+def test_extract_retries_are_bounded(tmp_path):
+    build = FailingBuild(IOError('Download failed'))
+    with pytest.raises(IOError):
+        BuildManager._extract(build, str(tmp_path / 'build'))
+    assert build.attempts == EXTRACT_ATTEMPTS
+
+
+def test_extract_disk_full(tmp_path):
+    build = FailingBuild(OSError(errno.ENOSPC, 'No space left on device'))
+    with pytest.raises(OSError):
+        BuildManager._extract(build, str(tmp_path / 'build'))
+    assert build.attempts == 1
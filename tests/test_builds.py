@@ -0,0 +1,132 @@
+# coding=utf-8
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+from datetime import datetime, timedelta
+
+import pytest
+
+from autobisect.builds import BuildRange
+
+START = datetime(2020, 1, 1)
+
+
+class FakeBuild(object):
+    def __init__(self, build_datetime, changeset):
+        self.build_datetime = build_datetime
+        self.changeset = changeset
+
+
+def _dates(*days):
+    return ['2020-01-%02d' % day for day in days]
+
+
+def test_new():
+    build_range = BuildRange.new(START, START + timedelta(days=9))
+    assert len(build_range) == 10
+    assert list(build_range) == _dates(*range(1, 11))
+    assert build_range[0] == '2020-01-01'
+    assert build_range[-1] == '2020-01-10'
+
+
+def test_loader_is_lazy():
+    loaded = []
+
+    def loader(build_id):
+        loaded.append(build_id)
+        return 'build-%s' % build_id
+
+    build_range = BuildRange.new(START, START + timedelta(days=9), loader)
+    assert not loaded
+    assert build_range.mid_point == 'build-2020-01-06'
+    assert build_range.mid_point == 'build-2020-01-06'
+    assert loaded == ['2020-01-06']
+
+
+def test_remove():
+    build_range = BuildRange.new(START, START + timedelta(days=9))
+    build_range.remove(2)
+    assert len(build_range) == 9
+    assert list(build_range) == _dates(1, 2, *range(4, 11))
+    assert build_range[2] == '2020-01-04'
+    assert build_range[len(build_range) - 1] == '2020-01-10'
+
+    build_range.remove(-1)
+    build_range.remove(0)
+    assert len(build_range) == 7
+    assert list(build_range) == _dates(2, *range(4, 10))
+    assert [build_range[i] for i in range(len(build_range))] == list(build_range)
+    with pytest.raises(IndexError):
+        build_range[len(build_range)]
+
+
+def test_remove_all():
+    build_range = BuildRange.new(START, START + timedelta(days=2))
+    while build_range:
+        build_range.remove(build_range.mid_index)
+    assert len(build_range) == 0
+    assert list(build_range) == []
+    with pytest.raises(IndexError):
+        build_range.mid_index
+
+
+def test_mid_index_after_removals():
+    build_range = BuildRange.new(START, START + timedelta(days=9))
+    assert build_range.mid_index == 5
+    build_range.remove(5)
+    assert build_range.mid_index == 4
+    assert build_range.mid_point == '2020-01-05'
+    build_range.remove(0)
+    build_range.remove(0)
+    assert len(build_range) == 7
+    assert build_range.mid_point == '2020-01-07'
+
+
+def test_slice_with_removals():
+    build_range = BuildRange.new(START, START + timedelta(days=9))
+    build_range.remove(1)
+    build_range.remove(6)
+
+    head = build_range[:4]
+    assert list(head) == _dates(1, 3, 4, 5)
+    tail = build_range[4:]
+    assert list(tail) == _dates(6, 7, 9, 10)
+    assert tail[0] == '2020-01-06'
+    assert tail.mid_point == '2020-01-09'
+
+    tail.remove(1)
+    assert list(tail) == _dates(6, 9, 10)
+    assert list(tail[1:]) == _dates(9, 10)
+    assert list(build_range[4:100]) == _dates(6, 9, 10)
+    assert len(build_range[5:2]) == 0
+
+
+def test_slice_releases_builds():
+    build_range = BuildRange.new(START, START + timedelta(days=9), lambda build_id: object())
+    build_range.mid_point
+    build_range[0]
+    view = build_range[:5]
+    assert list(view._builds) == [0]
+
+
+def test_index():
+    build_range = BuildRange.new(START, START + timedelta(days=9))
+    assert build_range.index(START + timedelta(days=3)) == 3
+    build_range.remove(1)
+    assert build_range.index(START + timedelta(days=3)) == 2
+    assert build_range[4:].index(START + timedelta(days=7)) == 2
+    with pytest.raises(ValueError):
+        build_range.index(START + timedelta(days=1))
+    with pytest.raises(ValueError):
+        build_range.index(START + timedelta(days=20))
+    with pytest.raises(ValueError):
+        build_range[:3].index(START + timedelta(days=5))
+
+
+def test_from_builds():
+    builds = [FakeBuild(START + timedelta(hours=hour), 'rev%d' % hour) for hour in (5, 1, 3)]
+    build_range = BuildRange.from_builds(builds, lambda changeset: 'loaded-%s' % changeset)
+    assert build_range.ids == ['rev1', 'rev3', 'rev5']
+    assert build_range._builds == {}
+    assert build_range.mid_point == 'loaded-rev3'
+    assert build_range.index(START + timedelta(hours=5)) == 2
@@ -0,0 +1,120 @@
+# coding=utf-8
+# This Source Code Form is subject to the terms of the Mozilla Public
+# License, v. 2.0. If a copy of the MPL was not distributed with this
+# file, You can obtain one at http://mozilla.org/MPL/2.0/.
+import errno
+import sqlite3
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from autobisect.build_manager import DatabaseManager
+from autobisect.resources import ResourceManager
+
+
+@pytest.fixture
+def managers(config):
+    """
+    Two resource managers using separate connections to the same database
+    """
+    created = []
+    for _ in range(2):
+        manager = ResourceManager(config, DatabaseManager(config.db_path))
+        manager.max_memory = 4096
+        manager.max_cpu = 2
+        created.append(manager)
+    yield created
+    for manager in created:
+        manager.db.close()
+
+
+def _tickets(manager):
+    return manager.db.cur.execute('SELECT ticket, admitted FROM reservations ORDER BY ticket').fetchall()
+
+
+def test_admission_in_ticket_order(managers):
+    first, second = managers
+    ticket_a = first._transaction(first._enqueue, 0, 1, 0)
+    ticket_b = second._transaction(second._enqueue, 0, 1, 0)
+
+    # Only the oldest waiting ticket may be admitted
+    assert not second._transaction(second._admit, ticket_b, 0, 1, 0)
+    assert first._transaction(first._admit, ticket_a, 0, 1, 0)
+    assert second._transaction(second._admit, ticket_b, 0, 1, 0)
+    assert _tickets(first) == [(ticket_a, 1), (ticket_b, 1)]
+
+
+def test_head_of_line_blocks_later_tickets(managers):
+    first, second = managers
+    with first.reserve(cpu=1):
+        # Requires the whole host so waits for the first reservation to be released
+        large = second._transaction(second._enqueue, 0, 2, 0)
+        small = first._transaction(first._enqueue, 0, 1, 0)
+        assert not second._transaction(second._admit, large, 0, 2, 0)
+        # Fits the remaining budget but must wait behind the larger ticket
+        assert not first._transaction(first._admit, small, 0, 1, 0)
+
+    assert second._transaction(second._admit, large, 0, 2, 0)
+    assert not first._transaction(first._admit, small, 0, 1, 0)
+    second._transaction(second._release, large)
+    assert first._transaction(first._admit, small, 0, 1, 0)
+
+
+def test_stale_tickets_removed(managers):
+    first, _ = managers
+    proc = subprocess.Popen([sys.executable, '-c', 'pass'])
+    proc.wait()
+    first.db.cur.execute('INSERT INTO reservations (pid, memory, cpu, disk, admitted) VALUES (?, 0, 2, 0, 1)',
+                         (proc.pid,))
+    first.db.cur.execute('INSERT INTO reservations (pid, memory, cpu, disk, admitted) VALUES (?, 0, 2, 0, 0)',
+                         (proc.pid,))
+    assert first.stale_pids() == [proc.pid]
+
+    with first.reserve(cpu=2):
+        assert [row[1] for row in _tickets(first)] == [1]
+    assert _tickets(first) == []
+
+
+def test_release_on_exception(managers):
+    first, second = managers
+    with pytest.raises(RuntimeError):
+        with first.reserve(memory=1024, cpu=1):
+            assert len(_tickets(second)) == 1
+            raise RuntimeError('Launch failed')
+    assert _tickets(second) == []
+
+
+def test_disk_which_cannot_fit_fails_fast(managers):
+    first, _ = managers
+    with pytest.raises(OSError) as exc:
+        with first.reserve(disk=first.available_disk * 2):
+            pass
+    assert exc.value.errno == errno.ENOSPC
+    assert _tickets(first) == []
+
+
+def test_locked_database_is_retried(config, managers):
+    first, _ = managers
+    first.db.cur.execute('PRAGMA busy_timeout = 10')
+    locked = threading.Event()
+
+    def hold_lock():
+        con = sqlite3.connect(config.db_path, isolation_level=None)
+        con.execute('BEGIN IMMEDIATE TRANSACTION')
+        locked.set()
+        time.sleep(0.5)
+        con.execute('COMMIT')
+        con.close()
+
+    holder = threading.Thread(target=hold_lock)
+    holder.start()
+    locked.wait()
+    try:
+        with first.reserve(cpu=1):
+            assert len(_tickets(first)) == 1
+    finally:
+        holder.join()
+    assert _tickets(first) == []